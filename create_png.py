@@ -1,18 +1,47 @@
 import argparse
 import os
 import re
-import subprocess
-import csv
+import string
+import io
 import logging
-from tabulate import tabulate
+import math
 
-# Set up logging configuration to capture detailed debug information
-for handler in logging.root.handlers[:]:
-    logging.root.removeHandler(handler)
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+# Stand-in equation used to split the page template into its fixed parts
+EQUATION_PLACEHOLDER = "<<EQUATION>>"
+
+# Preamble dumped into a precompiled xelatex format so every compile skips
+# loading these packages. gfsneohellenicot stays out of it: it loads native
+# OpenType fonts, which XeTeX cannot store in a format file.
+FORMAT_NAME = "equation_preamble"
+FORMAT_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMAT_PREAMBLE = r"""
+\documentclass{article}
+\usepackage[active,tightpage]{preview}
+\setlength\PreviewBorder{1pt}
+\usepackage{amsmath}
+\usepackage{xfrac}
+\usepackage{xcolor}
+"""
+
+# Filename cleanup: a str.translate deletion table for the common ASCII case,
+# the regex for names containing non-ASCII characters
+FILENAME_RE = re.compile(r"[^a-zA-Z0-9_.]")
+FILENAME_DELETE_TABLE = dict.fromkeys(
+    i for i in range(128) if chr(i) not in string.ascii_letters + string.digits + "_."
 )
 
+# Rendered images are cached in this subfolder of the output folder, keyed by
+# equation, color, resolution and preamble version. Bump PREAMBLE_VERSION
+# whenever the generated LaTeX changes, to invalidate previously cached images.
+CACHE_DIR_NAME = ".cache"
+PREAMBLE_VERSION = "v1"
+
+# LaTeX intermediates are written to a RAM-backed scratch folder where available
+SCRATCH_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Batches per CPU handed to the compile/rasterize pipeline
+PIPELINE_BATCHES_PER_CPU = 2
+
 
 class EquationProcessor:
     def __init__(self, file_path, output_path, resolution, color):
@@ -27,37 +56,45 @@ class EquationProcessor:
         """
         self.file_path = file_path
         self.output_path = os.path.join(os.getcwd(), output_path)
+        self.cache_path = os.path.join(self.output_path, CACHE_DIR_NAME)
+        self.scratch_path = None
         self.resolution = resolution
         self.color = color
+        # Encoded once, so batch documents are assembled from bytes around each equation
+        self.page_prefix, self.page_suffix = (
+            part.encode()
+            for part in self.wrap_equation_in_preview(EQUATION_PLACEHOLDER).split(
+                EQUATION_PLACEHOLDER
+            )
+        )
 
     def read_equation_list(self):
-        """Reads equations from the provided CSV file, skipping the header."""
-        equations = []
-        with open(self.file_path, "r") as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip the header
-            for row in reader:
-                if (
-                    row[0] == "1"
-                ):  # Filtering valid rows assuming '1' indicates a valid entry
-                    equations.append((row[1].strip(), row[2].strip()))
-        return equations
+        """Reads equations from the provided CSV file, skipping the header.
+
+        Rows are split directly on commas; the csv module is only used when the file contains quoted fields.
+        """
+        import csv
+
+        with open(self.file_path, "r", buffering=1 << 20, newline="") as file:
+            content = file.read()
+        if '"' in content:
+            reader = csv.reader(io.StringIO(content))
+            next(reader, None)  # Skip the header
+            return _filter_rows(reader)
+        # Split on "\n" only, like csv.reader; .strip() removes a trailing "\r"
+        lines = content.split("\n")[1:]  # Skip the header
+        return _filter_rows(line.split(",", 3) for line in lines)
 
     def clean_filename(self, filename):
         """Cleans a filename to remove unwanted characters, allowing only alphanumeric, underscore, and dot."""
-        return re.sub(r"[^a-zA-Z0-9_.]", "", filename)
+        if filename.isascii():
+            return filename.translate(FILENAME_DELETE_TABLE)
+        return FILENAME_RE.sub("", filename)
 
-    def wrap_equation_in_latex(self, equation, color):
-        """Wraps the provided equation in a LaTeX document template with consistent font size and controlled height."""
-        color_code = color.lstrip("#")
+    def wrap_equation_in_preview(self, equation):
+        """Wraps the provided equation in a preview environment, which becomes its own cropped page with consistent font size and controlled height."""
         return f"""
-        \\documentclass[border=1pt]{{standalone}}
-        \\usepackage{{amsmath}}
-        \\usepackage{{xfrac}}
-        \\usepackage{{gfsneohellenicot}}
-        \\usepackage{{xcolor}}
-        \\definecolor{{equationcolor}}{{HTML}}{{{color_code}}}
-        \\begin{{document}}
+        \\begin{{preview}}
         \\setbox0\\hbox{{\\Large \\textcolor{{equationcolor}}{{${equation}$}}}}
         \\dimen0=12mm
         \\ifdim\\ht0<\\dimen0
@@ -67,128 +104,504 @@ class EquationProcessor:
         \\dp0=5mm
         \\fi
         \\box0
-        \\end{{document}}"""
+        \\end{{preview}}"""
+
+    def build_batch_document(self, equations, color, preloaded=False):
+        """Builds a single UTF-8 encoded LaTeX document holding every equation as its own cropped page.
+
+        With `preloaded`, the shared preamble is left out because it comes from the precompiled format.
+        """
+        color_code = color.lstrip("#")
+        preamble = "" if preloaded else FORMAT_PREAMBLE
+        header = f"""{preamble}
+        \\usepackage{{gfsneohellenicot}}
+        \\definecolor{{equationcolor}}{{HTML}}{{{color_code}}}
+        \\begin{{document}}"""
+        footer = """
+        \\end{document}"""
+        pages = b"".join(
+            self.page_prefix + equation.encode() + self.page_suffix
+            for equation in equations
+        )
+        return header.encode() + pages + footer.encode()
 
     def check_create_folder(self):
-        """Ensures the output folder exists, creating it if necessary."""
-        os.makedirs(self.output_path, exist_ok=True)
+        """Ensures the output and cache folders exist, creating them if necessary."""
+        os.makedirs(self.cache_path, exist_ok=True)
         logging.info(f'Ensured folder "{self.output_path}" exists.\n\n')
 
-    def compile_latex_file(self, tex_file):
-        """Compiles a LaTeX file into a PDF and logs the compiler output with verbose real-time output."""
-        try:
-            output_dir = os.path.abspath(self.output_path).replace("\\", "/")
-            tex_file_unix = tex_file.replace("\\", "/")
+    def build_preamble_format(self):
+        """Dumps the shared preamble into a precompiled xelatex format next to the script, returning its path or None if it cannot be built.
+
+        The format is only rebuilt when the preamble, the xelatex binary or the system xelatex format changes,
+        which is detected from their stat; the system format also changes with LaTeX kernel and package updates.
+        """
+        import shutil
+        import subprocess
 
-            process = subprocess.Popen(
-                ["xelatex", f"-output-directory={output_dir}", tex_file_unix],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
+        source_file = os.path.join(FORMAT_DIR, FORMAT_NAME + ".ltx")
+        format_file = os.path.join(FORMAT_DIR, FORMAT_NAME + ".fmt")
+        try:
+            xelatex = shutil.which("xelatex")
+            if xelatex is None:
+                raise FileNotFoundError("xelatex not found on PATH")
+            xelatex = os.path.realpath(xelatex)
+            stamp = []
+            try:
+                system_format = subprocess.run(
+                    ["kpsewhich", "-engine=xetex", "xelatex.fmt"],
+                    capture_output=True,
+                    text=True,
+                ).stdout.strip()
+            except OSError:
+                system_format = ""
+            for stamped_file in filter(None, [xelatex, system_format]):
+                stat = os.stat(stamped_file)
+                stamp += [stamped_file, str(stat.st_size), str(stat.st_mtime_ns)]
+            source_content = f"% {' '.join(stamp)}\n{FORMAT_PREAMBLE}\\dump\n"
+            if os.path.exists(format_file) and os.path.exists(source_file):
+                with open(source_file, "r") as file:
+                    if file.read() == source_content:
+                        return format_file
+            with open(source_file, "w") as file:
+                file.write(source_content)
+            if os.path.exists(format_file):
+                os.remove(format_file)
+            format_dir_unix = FORMAT_DIR.replace("\\", "/")
+            subprocess.run(
+                [
+                    "xelatex",
+                    "-ini",
+                    "-interaction=batchmode",
+                    f"-jobname={FORMAT_NAME}",
+                    f"-output-directory={format_dir_unix}",
+                    "&xelatex",
+                    source_file.replace("\\", "/"),
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            )
+            if not os.path.exists(format_file):
+                raise FileNotFoundError(f"xelatex did not write {format_file}")
+            logging.info(f"Built preamble format: {os.path.basename(format_file)}")
+            return format_file
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.warning(
+                f"Could not build preamble format, compiling with full preamble: {e}"
             )
+            return None
+
+    async def compile_latex_file(self, tex_file, format_file=None):
+        """Compiles a LaTeX file into a PDF without blocking the event loop.
+
+        The compiler output is only streamed and logged in real-time when debug logging is enabled; otherwise
+        xelatex runs in batch mode and its log file is reported only if compilation fails.
+        """
+        import asyncio
+
+        try:
+            verbose = logging.getLogger().isEnabledFor(logging.DEBUG)
+            output_dir = os.path.dirname(os.path.abspath(tex_file)).replace("\\", "/")
+            tex_file_unix = tex_file.replace("\\", "/")
+            command = [
+                "xelatex",
+                "-interaction=nonstopmode" if verbose else "-interaction=batchmode",
+                "-halt-on-error",
+                "-no-shell-escape",
+                f"-output-directory={output_dir}",
+                tex_file_unix,
+            ]
+            if format_file:
+                # -fmt takes the format name without its .fmt extension
+                format_name = os.path.splitext(format_file)[0].replace("\\", "/")
+                command.insert(1, f"-fmt={format_name}")
 
-            # Print and log output in real-time
-            full_output = []
-            for line in process.stdout:
-                print(line, end="")  # Print to console in real-time
-                full_output.append(line)
-                logging.debug(line.strip())  # Log each line
+            if verbose:
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                )
 
-            process.wait()
+                # Log output in real-time
+                full_output = []
+                async for raw_line in process.stdout:
+                    line = raw_line.decode(errors="replace")
+                    full_output.append(line)
+                    logging.debug(line.strip())  # Log each line
 
-            if process.returncode != 0:
-                logging.error(f"LaTeX Compiler Errors:\n{''.join(full_output)}")
+                returncode = await process.wait()
+                output = "".join(full_output)
             else:
-                logging.info(
-                    f"Compiled LaTeX file successfully: {os.path.basename(tex_file)}"
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL,
                 )
-                logging.debug(f"LaTeX Compiler Output:\n{''.join(full_output)}")
+                returncode = await process.wait()
+                output = None
+
+            if returncode != 0:
+                if output is None:
+                    # Batch mode writes the compiler output to the log file only
+                    log_file = os.path.splitext(tex_file)[0] + ".log"
+                    with open(log_file, "r", errors="replace") as file:
+                        output = file.read()
+                logging.error(f"LaTeX Compiler Errors:\n{output}")
+                return False
+            logging.info(
+                f"Compiled LaTeX file successfully: {os.path.basename(tex_file)}"
+            )
+            if verbose:
+                logging.debug(f"LaTeX Compiler Output:\n{output}")
+            return True
 
         except Exception as e:
             logging.error(
                 f"LaTeX compilation failed for {os.path.basename(tex_file)}: {str(e)}"
             )
+            return False
 
-    def convert_pdf_to_png(self, pdf_file, png_file):
-        """Converts a PDF file to PNG format using ImageMagick's `convert` command."""
+    def rasterize_batch(self, pdf_file, png_files):
+        """Renders every page of a PDF file in-process with PyMuPDF, saving page N as the N-th requested PNG file; returns None if the page count doesn't match."""
+        import pymupdf
+
+        converted = []
         try:
-            pdf_file_unix = pdf_file.replace("\\", "/")
-            png_file_unix = png_file.replace("\\", "/")
-            subprocess.run(
-                [
-                    "magick",
-                    "convert",
-                    "-density",
-                    str(self.resolution),
-                    "-quality",
-                    "100",
-                    pdf_file_unix,
-                    png_file_unix,
-                ],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=True,
-            )
-            logging.info(f"Converted PDF to PNG: {os.path.basename(pdf_file)}\n")
-        except subprocess.CalledProcessError as e:
+            with pymupdf.open(pdf_file) as doc:
+                if doc.page_count != len(png_files):
+                    # Pages map to files by position, so any missing page shifts all later ones
+                    logging.error(
+                        f"{os.path.basename(pdf_file)} has {doc.page_count} pages, expected {len(png_files)}"
+                    )
+                    return None
+                zoom = self.resolution / 72
+                matrix = pymupdf.Matrix(zoom, zoom)
+                for page, png_file in enumerate(png_files):
+                    # Written under a temporary name first, so an interrupted save
+                    # never leaves a truncated PNG under the final name
+                    temp_file = png_file + ".tmp"
+                    pixmap = doc[page].get_pixmap(matrix=matrix, alpha=True)
+                    pixmap.save(temp_file, output="png")
+                    os.replace(temp_file, png_file)
+                    converted.append(True)
+        except (OSError, RuntimeError, ValueError) as e:
             logging.error(
                 f"PDF to PNG conversion failed for {os.path.basename(pdf_file)}: {e}"
             )
+            return converted + [False] * (len(png_files) - len(converted))
+        logging.info(f"Converted PDF to PNG: {os.path.basename(pdf_file)}\n")
+        return converted
 
     def cleanup_files(self):
-        """Cleans up intermediate files generated during the processing."""
-        file_extensions = [".log", ".aux", ".tex", ".pdf"]
-        deleted_files = 0
-        for root, dirs, files in os.walk(self.output_path):
-            for file in files:
-                if any(file.endswith(ext) for ext in file_extensions):
-                    os.remove(os.path.join(root, file))
-                    deleted_files += 1
-        logging.info(
-            f"\nDeleted {deleted_files} intermediate files and build directories."
+        """Cleans up the scratch folder holding the intermediate files generated during the processing."""
+        import shutil
+
+        shutil.rmtree(self.scratch_path, ignore_errors=True)
+        logging.info(f"\nDeleted intermediate files in {self.scratch_path}.")
+
+    def cache_file(self, equation):
+        """Returns the path of the cached PNG for an equation rendered with the current color and resolution."""
+        import hashlib
+
+        key = hashlib.blake2b(
+            f"{equation}|{self.color}|{self.resolution}|{PREAMBLE_VERSION}".encode(),
+            digest_size=16,
+        ).hexdigest()
+        return os.path.join(self.cache_path, key + ".png")
+
+    def link_file(self, source, target):
+        """Hardlinks a file to its target path, replacing the target atomically and falling back to a copy where hardlinks are unsupported."""
+        import shutil
+
+        if os.path.exists(target) and os.path.samefile(source, target):
+            return
+        temp_target = target + ".tmp"
+        try:
+            try:
+                os.link(source, temp_target)
+            except FileExistsError:
+                os.remove(temp_target)
+                os.link(source, temp_target)
+            except OSError:
+                shutil.copy2(source, temp_target)
+            os.replace(temp_target, target)
+        except OSError:
+            if os.path.lexists(temp_target):
+                os.remove(temp_target)
+            raise
+
+    def restore_from_cache(self, cache_file, base_filename):
+        """Links a cached PNG to its output file, returning the output path or None if it cannot be written."""
+        png_file_path = os.path.join(self.output_path, base_filename + ".png")
+        try:
+            self.link_file(cache_file, png_file_path)
+        except OSError as e:
+            logging.error(f"Could not write {os.path.basename(png_file_path)}: {e}")
+            return None
+        return png_file_path
+
+    def prune_cache(self, assigned):
+        """Records which output files each cached PNG backs in manifest.json and deletes cached PNGs no output file uses anymore."""
+        import json
+
+        manifest_path = os.path.join(self.cache_path, "manifest.json")
+        try:
+            with open(manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = {}
+        # Both folders are listed once instead of probing each file
+        cached_files = set(os.listdir(self.cache_path))
+        output_files = set(os.listdir(self.output_path))
+        assignments = {}
+        for _, equation, base_filename in assigned:
+            cache_filename = os.path.basename(self.cache_file(equation))
+            if cache_filename in cached_files:
+                key = os.path.splitext(cache_filename)[0]
+                assignments[base_filename + ".png"] = key
+        # Output files rendered in this run are no longer backed by their old entry
+        manifest = {
+            key: [
+                filename
+                for filename in filenames
+                if filename not in assignments and filename in output_files
+            ]
+            for key, filenames in manifest.items()
+        }
+        for filename, key in assignments.items():
+            manifest.setdefault(key, []).append(filename)
+        manifest = {key: filenames for key, filenames in manifest.items() if filenames}
+        pruned_files = 0
+        for cache_filename in cached_files:
+            key, extension = os.path.splitext(cache_filename)
+            # Leftover .tmp files come from renders that were interrupted
+            if extension == ".tmp" or (extension == ".png" and key not in manifest):
+                os.remove(os.path.join(self.cache_path, cache_filename))
+                pruned_files += 1
+        with open(manifest_path, "w") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        logging.info(f"Pruned {pruned_files} unused cached images.")
+
+    def assign_filenames(self, equations):
+        """Resolves a unique base filename per equation up front, so parallel workers never race on the same name."""
+        claimed = set()
+        assigned = []
+        for i, (equation, filename) in enumerate(equations, start=1):
+            base_filename = self.clean_filename(
+                filename if filename else f"equation_{i}"
+            )
+            unique_filename = base_filename
+            suffix = i
+            # Compared case-insensitively, as Windows and macOS file systems do
+            while unique_filename.casefold() in claimed:
+                unique_filename = f"{base_filename}_{suffix}"
+                suffix += 1
+            claimed.add(unique_filename.casefold())
+            assigned.append((i, equation, unique_filename))
+        return assigned
+
+    async def compile_batch(self, k, batch, format_file):
+        """Writes and compiles the LaTeX document for a batch of equations, returning the PDF path or None on failure."""
+        latex_content = self.build_batch_document(
+            [equation for _, equation, _ in batch],
+            self.color,
+            preloaded=bool(format_file),
+        )
+        base_path = os.path.join(self.scratch_path, f"_batch_{k}")
+        tex_file_path, pdf_file_path = base_path + ".tex", base_path + ".pdf"
+        fd = os.open(
+            tex_file_path,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+            0o644,
         )
+        try:
+            os.write(fd, latex_content)
+        finally:
+            os.close(fd)
+        if not await self.compile_latex_file(tex_file_path, format_file):
+            return None
+        return pdf_file_path
+
+    async def run_pipeline(self, batches, format_file):
+        """Compiles batches with at most one xelatex process per CPU while finished PDFs are rasterized in a process pool, so both stages overlap."""
+        import asyncio
+        import concurrent.futures
+
+        compile_slots = asyncio.Semaphore(os.cpu_count() or 1)
+        loop = asyncio.get_running_loop()
+
+        async def process_batch(k, batch, retry_full_preamble=True):
+            nonlocal format_file
+            batch_format_file = format_file
+            async with compile_slots:
+                pdf_file_path = await self.compile_batch(k, batch, batch_format_file)
+            if pdf_file_path is None and batch_format_file and retry_full_preamble:
+                # A stale or incompatible format fails every compile, so retry once
+                # with the full preamble before blaming the batch's equations
+                async with compile_slots:
+                    pdf_file_path = await self.compile_batch(f"{k}_full", batch, None)
+                if pdf_file_path is not None and format_file:
+                    logging.warning(
+                        "Batch only compiles with the full preamble; no longer using the preamble format"
+                    )
+                    format_file = None
+            if pdf_file_path is not None:
+                args = (
+                    pdf_file_path,
+                    batch,
+                    self.output_path,
+                    self.color,
+                    self.resolution,
+                )
+                results = await loop.run_in_executor(executor, _rasterize_batch, args)
+                if results is not None:
+                    return results
+                failure = "PDF page count mismatch"
+            else:
+                failure = "LaTeX compilation error"
+            if len(batch) == 1:
+                i, equation, _ = batch[0]
+                return [f"Equation {i} failed: {failure} in ${equation}$"]
+            # One bad equation fails its whole batch; compile each equation of the
+            # batch in its own document so only the bad one fails and is named
+            logging.warning(
+                f"_batch_{k}.tex failed ({failure}), retrying its {len(batch)} equations one per document"
+            )
+            retried = await asyncio.gather(
+                *(
+                    process_batch(f"{k}_{j}", [entry], retry_full_preamble=False)
+                    for j, entry in enumerate(batch, start=1)
+                )
+            )
+            return [result for results in retried for result in results]
+
+        with concurrent.futures.ProcessPoolExecutor(
+            initializer=configure_logging
+        ) as executor:
+            for results in asyncio.as_completed(
+                [process_batch(k, batch) for k, batch in enumerate(batches, start=1)]
+            ):
+                # A failing batch must not abort the others, or the cache cleanup
+                try:
+                    results = await results
+                except Exception as e:
+                    logging.error(f"Batch processing failed: {e}")
+                    continue
+                for result in results:
+                    logging.info(result)
 
     def process_equations(self):
         """Main processing function for equations from a CSV file to PNG images."""
+        import asyncio
+        import tempfile
+
         self.check_create_folder()
         equations = self.read_equation_list()
+        table = [f"{'Index':>5}  {'Filename':<30}  Equation"] + [
+            f"{i:>5}  {filename:<30}  {equation}"
+            for i, (equation, filename) in enumerate(equations, start=1)
+        ]
         print("Loaded Equations:")
-        headers = ["Index", "Equation", "Filename"]
-        table = [[i, eq[0], eq[1]] for i, eq in enumerate(equations, start=1)]
-        print(tabulate(table, headers=headers, tablefmt="grid"))
+        print("\n".join(table))
         confirmation = (
             input("\n\nDo you want to proceed with these equations? (y/n): ")
             .strip()
             .lower()
         )
         if confirmation != "y":
-            print("Operation cancelled by user.")
+            logging.info("Operation cancelled by user.")
             return
-        for i, (equation, filename) in enumerate(equations, start=1):
-            latex_content = self.wrap_equation_in_latex(equation, self.color)
-            base_filename = self.clean_filename(
-                filename if filename else f"equation_{i}"
+        assigned = self.assign_filenames(equations)
+        # Equations already rendered with the same settings are linked from the
+        # cache; repeated uncached equations are rendered once and linked afterwards
+        pending = []
+        duplicates = []
+        pending_cache_files = set()
+        cached_files = set(os.listdir(self.cache_path))
+        for i, equation, base_filename in assigned:
+            cache_file = self.cache_file(equation)
+            if os.path.basename(cache_file) in cached_files:
+                png_file_path = self.restore_from_cache(cache_file, base_filename)
+                logging.info(
+                    f"{png_file_path} (cached)"
+                    if png_file_path
+                    else f"Equation {i} failed: could not write {base_filename}.png"
+                )
+            elif cache_file in pending_cache_files:
+                duplicates.append((i, equation, base_filename))
+            else:
+                pending_cache_files.add(cache_file)
+                pending.append((i, equation, base_filename))
+        if pending:
+            format_file = self.build_preamble_format()
+            # More batches than CPUs, so compiling and rasterizing can overlap
+            batch_count = PIPELINE_BATCHES_PER_CPU * (os.cpu_count() or 1)
+            batch_size = max(1, math.ceil(len(pending) / batch_count))
+            batches = [
+                pending[start : start + batch_size]
+                for start in range(0, len(pending), batch_size)
+            ]
+            self.scratch_path = tempfile.mkdtemp(prefix="latex_", dir=SCRATCH_ROOT)
+            try:
+                asyncio.run(self.run_pipeline(batches, format_file))
+            finally:
+                self.cleanup_files()
+        cached_files = set(os.listdir(self.cache_path))
+        for i, equation, base_filename in duplicates:
+            cache_file = self.cache_file(equation)
+            png_file_path = None
+            if os.path.basename(cache_file) in cached_files:
+                png_file_path = self.restore_from_cache(cache_file, base_filename)
+            logging.info(
+                f"{png_file_path} (cached)"
+                if png_file_path
+                else f"Equation {i} failed: no image written for {base_filename}.png"
+            )
+        self.prune_cache(assigned)
+
+
+def _rasterize_batch(args):
+    """Worker: renders a compiled batch PDF into the cache and links each page to its output file, returning the PNG paths or error messages, or None if the pages don't match the batch."""
+    pdf_file_path, batch, output_path, color, resolution = args
+    processor = EquationProcessor(None, output_path, resolution, color)
+    # The preview package emits one page per equation, in input order; pages
+    # are rendered into the cache and linked to their output files from there
+    cache_files = [processor.cache_file(equation) for _, equation, _ in batch]
+    converted = processor.rasterize_batch(pdf_file_path, cache_files)
+    if converted is None:
+        return None
+    results = []
+    for (i, _, base_filename), cache_file, ok in zip(batch, cache_files, converted):
+        if not ok:
+            results.append(
+                f"Equation {i} failed: PDF to PNG conversion error for {base_filename}.png"
             )
-            tex_filename = base_filename + ".tex"
-            increment = 1
-            while os.path.exists(os.path.join(self.output_path, tex_filename)):
-                tex_filename = f"{base_filename}_{increment}.tex"
-                increment += 1
-            tex_file_path = os.path.join(self.output_path, tex_filename)
-            with open(tex_file_path, "w") as tex_file:
-                tex_file.write(latex_content)
-            print("test 1")
-            self.compile_latex_file(tex_file_path)
-            print("test 2")
-            pdf_file_path = tex_file_path.replace(".tex", ".pdf")
-            png_file_path = tex_file_path.replace(".tex", ".png")
-            self.convert_pdf_to_png(pdf_file_path, png_file_path)
-        self.cleanup_files()
+            continue
+        png_file_path = processor.restore_from_cache(cache_file, base_filename)
+        results.append(
+            png_file_path or f"Equation {i} failed: could not write {base_filename}.png"
+        )
+    return results
+
+
+def _filter_rows(rows):
+    """Keeps the (equation, filename) pairs of rows marked valid with '1' in the first column."""
+    return [(row[1].strip(), row[2].strip()) for row in rows if row[0] == "1"]
+
+
+def configure_logging():
+    """Set up logging configuration to capture detailed debug information, also used to initialize worker processes."""
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
 
 
 def main():
+    configure_logging()
     parser = argparse.ArgumentParser(
         description="Process equations from a CSV file into PNG images."
     )
@@ -0,0 +1,71 @@
+import csv
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import create_png  # noqa: E402
+
+
+def make_processor(tmp_path, file_path=None):
+    processor = create_png.EquationProcessor(
+        file_path, str(tmp_path / "output"), 300, "#2b363a"
+    )
+    os.makedirs(processor.cache_path)
+    return processor
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "valid,equation,filename\n1,x^2,square\n0,y,skipped\n1,\\frac{a}{b},fraction\n",
+        "valid,equation,filename\r\n1,x^2,square\r\n0,y,skipped\r\n1,z,last",
+        "valid,equation,filename\n1,a\x0cb,form\x0cfeed\n1,c,d\n",
+        "valid,equation,filename,notes\n1,x,a,extra,columns\n1,y,b\n1,z,c,\n",
+        'valid,equation,filename\n1,"a,b",quoted\n1,c,plain\n',
+    ],
+)
+def test_read_equation_list_matches_csv_reader(tmp_path, content):
+    csv_file = tmp_path / "equations.csv"
+    csv_file.write_bytes(content.encode())
+    reader = csv.reader(io.StringIO(content, newline=""))
+    next(reader)
+    expected = create_png._filter_rows(reader)
+    processor = make_processor(tmp_path, str(csv_file))
+    assert processor.read_equation_list() == expected
+
+
+def test_assign_filenames_resolves_case_insensitive_collisions(tmp_path):
+    processor = make_processor(tmp_path)
+    assigned = processor.assign_filenames([("a", "x"), ("b", "X"), ("c", "x_2")])
+    filenames = [base_filename for _, _, base_filename in assigned]
+    assert filenames == ["x", "X_2", "x_2_3"]
+    assert len({filename.casefold() for filename in filenames}) == len(filenames)
+
+
+def test_prune_cache_keeps_only_cached_images_in_use(tmp_path):
+    processor = make_processor(tmp_path)
+
+    def render(assigned):
+        for _, equation, base_filename in assigned:
+            for path in (
+                processor.cache_file(equation),
+                os.path.join(processor.output_path, base_filename + ".png"),
+            ):
+                with open(path, "wb") as file:
+                    file.write(equation.encode())
+        processor.prune_cache(assigned)
+
+    render([(1, "x", "first"), (2, "y", "second")])
+    leftover = processor.cache_file("z")[:-4] + ".tmp"
+    with open(leftover, "wb"):
+        pass
+    # The second run renders a new equation into "second.png" and leaves "first.png" alone
+    render([(1, "z", "second")])
+    assert os.path.exists(processor.cache_file("x"))
+    assert not os.path.exists(processor.cache_file("y"))
+    assert os.path.exists(processor.cache_file("z"))
+    assert not os.path.exists(leftover)